@@ -15,6 +15,8 @@ class Bar(object):
                       joints[1], the second joints[1] and joints[2], and so on. Must contain
                       floor(len(joints) / 2.0) elements. The total length of the bar is the sum
                       of these.
+    
+    None of `label`, `joints`, and `segment_lengths` should be modified after the bar is created.
     """
     def __init__(self, label, joints, segment_lengths):
         self.label = label
@@ -24,12 +26,34 @@ class Bar(object):
             raise ValueError("A bar must have at least two joints.")
         if not len(segment_lengths) == len(joints) - 1:
             raise ValueError("Wrong number of segment lengths. Got %s, expected %s." % (len(segment_lengths), len(joints) - 1))
+        #Precompute each joint's position in the bar and its distance along the bar from joints[0].
+        self._joint_index = {}
+        self._origin_distances = {}
+        distance = 0
+        for index, joint in enumerate(joints):
+            self._joint_index[joint] = index
+            self._origin_distances[joint] = distance
+            if index < len(segment_lengths):
+                distance += segment_lengths[index]
+        self._str_format = None
             
+    def clone(self, joint_mapping):
+        """Returns a new bar with the same label and segment lengths.
+        
+        Parameters:
+            joint_mapping: A dictionary mapping joints of this bar to the joints of the new bar.
+                           Joints that aren't in it are shared with this bar.
+        """
+        return Bar(self.label, [joint_mapping.get(joint, joint) for joint in self.joints], self.segment_lengths[:])
+    
     def __repr__(self):
         return str(self)
     
     def __str__(self):
-        return ("%s: " % self.label) + (" -- %s -- ".join([str(joint) for joint in self.joints])) % tuple(self.segment_lengths)
+        #Only the joints' part of the string changes, so build the rest once and reuse it.
+        if self._str_format == None:
+            self._str_format = ("%s: " % self.label).replace("%", "%%") + "%s" + "".join(" -- %s -- %%s" % length for length in self.segment_lengths)
+        return self._str_format % tuple(str(joint) for joint in self.joints)
     
     def known_endpoints(self):
         """Returns a number between indicating how many of the bar's endpoints are known."""
@@ -37,28 +61,38 @@ class Bar(object):
     
     def origin_distance(self, joint):
         """Find the distance of some joint from the origin joint (the first member of joints)."""
-        if(not joint in self.joints):
+        try:
+            return self._origin_distances[joint]
+        except KeyError:
             raise ValueError("The given joint %s is not in this bar's joint list." % joint)
-        distance = 0
-        for index, element in enumerate(self.joints):
-            if(joint == element):
-                break;
-            distance += self.segment_lengths[index]
-        return distance
     
     def joint_distance(self, joint1, joint2):
         """Find the distance between two joints on the bar."""
         return abs(self.origin_distance(joint1) - self.origin_distance(joint2))
     
+    def _index(self, joint):
+        """Returns the position of a joint in `joints`."""
+        try:
+            return self._joint_index[joint]
+        except KeyError:
+            raise ValueError("The given joint %s is not in this bar's joint list." % joint)
+    
     def neighbor_joints(self, joint):
         """Finds the one or two joints directly next to the given joint on the bar."""
-        if(not joint in self.joints):
-            raise ValueError("The given joint %s is not in this bar's joint list." % joint)
-        i = self.joints.index(joint)
+        i = self._index(joint)
         if(i == 0):
             return [self.joints[1]]
         elif(i == len(self.joints) - 1):
             return [self.joints[i - 1]]
         else:
             return [self.joints[i - 1], self.joints[i + 1]]
-    
\ No newline at end of file
+        
+    def left_neighbor(self, joint):
+        """Returns the joint before the given joint on the bar, or None if it is the first joint."""
+        i = self._index(joint)
+        return self.joints[i - 1] if i > 0 else None
+    
+    def right_neighbor(self, joint):
+        """Returns the joint after the given joint on the bar, or None if it is the last joint."""
+        i = self._index(joint)
+        return self.joints[i + 1] if i < len(self.joints) - 1 else None
@@ -87,13 +87,15 @@ class BarBuilder(Labelable):
             self.next_expected = "len"
     
     def __sub__(self, other):
-        other_type = ""
-        if(isinstance(other, Number)):
-            other_type = "len"
-        elif(isinstance(other, Joint) or isinstance(other, BarBuilder)):
-            other_type = "joint"
-        else:
-            raise TypeError("Next bar building value %s is not a length or a joint." % other)
+        other_type = _VALUE_TYPES.get(type(other))
+        if(other_type == None):
+            #Subclasses and other numeric types aren't in the table.
+            if(isinstance(other, Number)):
+                other_type = "len"
+            elif(isinstance(other, Joint) or isinstance(other, BarBuilder)):
+                other_type = "joint"
+            else:
+                raise TypeError("Next bar building value %s is not a length or a joint." % other)
         if(other_type != self.next_expected):
             raise ValueError("Expecting next bar building value to be a %s, got a %s." % (self.next_expected, other_type))
         else:
@@ -123,6 +125,10 @@ class BarBuilder(Labelable):
                              Segs: %s\n\
                              Joints: %s" % (self.label, self.segments, self.joints))
         return Bar(self.label, self.joints, self.segments)
-    
-    
-    
+
+#The kind of bar building value for the common types, to avoid slow isinstance checks against Number in BarBuilder.__sub__.
+_VALUE_TYPES = {int : "len",
+                long : "len",
+                float : "len",
+                Joint : "joint",
+                BarBuilder : "joint"}
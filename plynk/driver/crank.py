@@ -1,6 +1,8 @@
 from driver import Driver
 import math
 
+import numpy as np
+
 class Crank(Driver):
     """An instance of the `Crank` class represents a rotating drive crank in the linkage mechanism.
     
@@ -12,12 +14,26 @@ class Crank(Driver):
         speed: The percentage of a full rotation that the crank should go through in 1 unit of time.
         starting_angle: The angle to start with in radians.
     """
+    constant_attributes = ('speed',)
+    
     def __init__(self, label, location, attachment_joint, length, speed = 1.0, starting_angle = 0):
         Driver.__init__(self, label, location, attachment_joint, speed)
         self.starting_angle = starting_angle
         self.length = length
         
-    def point_for_time(self, time):
-        res = (self.location[0] + self.length * math.cos(self.starting_angle + time * 2 * math.pi),
-               self.location[1] + self.length * math.sin(self.starting_angle + time * 2 * math.pi))
-        return res
\ No newline at end of file
+    def update_constants(self):
+        #The angle turned per unit of (unadjusted) simulator time:
+        self._omega = 2 * math.pi * self.speed
+        
+    def write_point(self, time, xy_array, joint_idx):
+        #No need to reduce time; cos and sin are periodic anyway.
+        angle = self.starting_angle + time * 2 * math.pi
+        xy_array[joint_idx, 0] = self.location[0] + self.length * math.cos(angle)
+        xy_array[joint_idx, 1] = self.location[1] + self.length * math.sin(angle)
+    
+    def points_for_times(self, times):
+        theta = self.starting_angle + np.asarray(times, dtype=float) * self._omega
+        points = np.empty((len(theta), 2))
+        points[:, 0] = self.location[0] + self.length * np.cos(theta)
+        points[:, 1] = self.location[1] + self.length * np.sin(theta)
+        return points
\ No newline at end of file
@@ -1,6 +1,8 @@
 from plynk.joint import Joint
 import math
 
+import numpy as np
+
 class Driver(object):
     """The abstract superclass representing moving parts of the linkage that drive it, such as cranks and pistons.
     
@@ -12,19 +14,99 @@ class Driver(object):
                For example, a crank with speed 0.5 would make it from 0 degrees to 180 degrees, while one at
                1.0 speed would go from 0 degrees to 360 degrees.
     """
+    #The attributes that subclasses derive cached constants from in `update_constants`.
+    constant_attributes = ()
+    
     def __init__(self, label, location, attachment_joint, speed=1.0):
+        self.precompute(None)
         self.label = label
         self.location = location
         self.attachment_joint = attachment_joint
         self.speed = speed
         
+    def __setattr__(self, aname, value):
+        object.__setattr__(self, aname, value)
+        if not aname.startswith('_'):
+            #Precomputed points may depend on whatever changed.
+            self.__dict__['_x_table'] = None
+        if aname in self.constant_attributes:
+            #Only recompute once every attribute the constants depend on has been set.
+            if all(a in self.__dict__ for a in self.constant_attributes):
+                self.update_constants()
+                
+    def clone(self, joint_mapping):
+        """Returns a shallow copy of the driver.
+        
+        Parameters:
+            joint_mapping: A dictionary mapping joints to the joints the new driver should use instead.
+                           If attachment_joint isn't in it, the new driver shares it with this one.
+        """
+        new = object.__new__(type(self))
+        #Every attribute, including cached constants, carries over; none are mutated in place.
+        new.__dict__.update(self.__dict__)
+        new.attachment_joint = joint_mapping.get(self.attachment_joint, self.attachment_joint)
+        return new
+        
+    def update_constants(self):
+        """Recompute any values cached from `constant_attributes`.
+        
+        Called automatically whenever one of `constant_attributes` is assigned.
+        Returns nothing.
+        """
+        pass
+        
     def update_attachment_point(self, time):
         """Updates attachment_joint to the correct position for `time`.
         Arguments:
             time: A value ranging from 0.0 to 1.0 indicating the current simulated time.
         Returns nothing.
         """
-        self.attachment_joint.location = self.point_for_time(math.fmod(time * self.speed, 1.0))
+        joint = self.attachment_joint
+        i = self._time_index.get(time) if self._x_table is not None else None
+        if i is not None:
+            joint.set_location_dynamic((self._x_table[i], self._y_table[i]))
+        else:
+            joint_array, idx = joint.array_row()
+            self.write_point(time * self.speed, joint_array.xy, idx)
+            joint_array.changed((idx,))
+        
+    def precompute(self, times):
+        """Precompute the attachment points for a batch of simulated times.
+        
+        `update_attachment_point` looks up the points for these exact times instead of computing them.
+        The precomputed points are discarded whenever a public attribute of the driver is assigned.
+        Arguments:
+            times: A sequence of simulated times, as would be passed to `update_attachment_point`,
+                   or None to discard any precomputed points.
+        Returns nothing.
+        """
+        if times is None:
+            self._x_table = None
+            self._y_table = None
+            self._time_index = None
+            return
+        times = np.asarray(times, dtype=float)
+        points = self.points_for_times(times)
+        #Plain lists of floats are faster to index one at a time than arrays.
+        self._x_table = points[:, 0].tolist()
+        self._y_table = points[:, 1].tolist()
+        self._time_index = dict((t, i) for i, t in enumerate(times.tolist()))
+        
+    def write_point(self, time, xy_array, joint_idx):
+        """Writes the correct position for attachment_joint for `time` into a row of an array.
+        
+        Subclasses should override either this or `point_for_time`; overriding this avoids making
+        a tuple for every frame.
+        Arguments:
+            time: A value indicating the current speed-adjusted simulated time. This is not reduced
+                  to the range 0.0 to 1.0; a driver overriding this whose motion isn't periodic in
+                  time on its own must reduce it itself. This implementation reduces it for
+                  `point_for_time`.
+            xy_array: An (N, 2) array of X, Y rows, such as `JointArray.xy`.
+            joint_idx: The row of `xy_array` to write.
+        Returns nothing.
+        """
+        xy_array[joint_idx, 0], xy_array[joint_idx, 1] = self.point_for_time(math.fmod(time, 1.0))
         
     def point_for_time(self, time):
         """Returns the correct position for attachment_joint for `time`.
@@ -32,4 +114,25 @@ class Driver(object):
             time: A value ranging from 0.0 to 1.0 indicating the current speed-adjusted simulated time.
         Returns an X, Y tuple.
         """
-        raise NotImplementedError("Instances of Driver are not meant to be used directly. Use a subclass that implements this method.")
\ No newline at end of file
+        if type(self).write_point.__func__ is Driver.write_point.__func__:
+            raise NotImplementedError("Instances of Driver are not meant to be used directly. Use a subclass that implements this method.")
+        #Kept for compatibility; subclasses implementing `write_point` get this for free.
+        xy = np.empty((1, 2))
+        self.write_point(time, xy, 0)
+        return tuple(xy[0].tolist())
+        
+    def points_for_times(self, times):
+        """Returns the correct positions for attachment_joint for every simulated time in `times`.
+        
+        Subclasses should override this with a vectorized implementation; this one just calls
+        `write_point` once per time.
+        Arguments:
+            times: An array of values ranging from 0.0 to 1.0 indicating simulated times. These
+                   are NOT speed-adjusted; the adjustment is done here, as in `update_attachment_point`.
+        Returns an (N, 2) array of X, Y rows.
+        """
+        times = np.asarray(times, dtype=float) * self.speed
+        points = np.empty((len(times), 2))
+        for i, time in enumerate(times):
+            self.write_point(time, points, i)
+        return points
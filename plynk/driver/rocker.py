@@ -1,6 +1,8 @@
 from driver import Driver
 import math
 
+import numpy as np
+
 class Rocker(Driver):
     """A rocker type driver.
     
@@ -13,17 +15,32 @@ class Rocker(Driver):
         starting_angle: The angle, in degrees, for the rocker to start at.
         ending_angle: The angle, in degrees, for the rocker to end at.
     """
+    constant_attributes = ('starting_angle', 'ending_angle')
+    
     def __init__(self, label, location, attachment_joint, length, starting_angle, ending_angle, speed = 1.0):
         Driver.__init__(self, label, location, attachment_joint, speed)
         self.length = length
         self.starting_angle = starting_angle
         self.ending_angle = ending_angle
         
-    def point_for_time(self, time):
-        if(time < 0.5):
-            angle = self.starting_angle + time * 2 * (self.ending_angle - self.starting_angle)
-        else:
-            angle = self.ending_angle - (time - 0.5) * 2 * (self.ending_angle - self.starting_angle)
-        #Convert degrees to radians for the math functions:
-        angle = (angle / 360.0) * 2 * math.pi
-        return (self.location[0] + self.length * math.cos(angle), self.location[1] + self.length * math.sin(angle))
\ No newline at end of file
+    def update_constants(self):
+        #Convert degrees to radians once, rather than every frame:
+        self._starting_radians = math.radians(self.starting_angle)
+        self._sweep_radians = math.radians(self.ending_angle - self.starting_angle)
+        
+    def write_point(self, time, xy_array, joint_idx):
+        #Reduce to a single back and forth:
+        time -= math.floor(time)
+        #Sweep out and back as a triangle wave: 0 at time 0, 1 at time 0.5, and 0 again at time 1.
+        angle = self._starting_radians + (1.0 - abs(2.0 * time - 1.0)) * self._sweep_radians
+        xy_array[joint_idx, 0] = self.location[0] + self.length * math.cos(angle)
+        xy_array[joint_idx, 1] = self.location[1] + self.length * math.sin(angle)
+    
+    def points_for_times(self, times):
+        t = np.asarray(times, dtype=float) * self.speed
+        t -= np.floor(t)
+        angle = self._starting_radians + (1.0 - np.abs(2.0 * t - 1.0)) * self._sweep_radians
+        points = np.empty((len(t), 2))
+        points[:, 0] = self.location[0] + self.length * np.cos(angle)
+        points[:, 1] = self.location[1] + self.length * np.sin(angle)
+        return points
\ No newline at end of file
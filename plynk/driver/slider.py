@@ -2,6 +2,8 @@ from driver import Driver
 from plynk import geometry
 import math
 
+import numpy as np
+
 class Slider(Driver):
     """A slider type driver.
     
@@ -14,15 +16,29 @@ class Slider(Driver):
         attachment_joint: The joint the slider moves.
         speed: The percentage of the one back and forth that should be covered over all time.
     """
+    constant_attributes = ('location', 'endpoint')
+    
     def __init__(self, label, location, endpoint, attachment_joint, speed = 1.0):
         Driver.__init__(self, label, location, attachment_joint, speed)
         self.endpoint = endpoint
         
-    def point_for_time(self, time):
-        length = geometry.distance(self.location, self.endpoint)
-        angle = geometry.line_angle(self.location, self.endpoint)
-        if(time < 0.5):
-            distance = time * 2 * length
-        else:
-            distance = length - (time - 0.5) * 2 * length
-        return (self.location[0] + distance * math.cos(angle), self.location[1] + distance * math.sin(angle))
\ No newline at end of file
+    def update_constants(self):
+        #The line the slider moves along only changes when its endpoints do:
+        self._cos, self._sin, self._length = geometry.line_direction(self.location, self.endpoint)
+        
+    def write_point(self, time, xy_array, joint_idx):
+        #Reduce to a single back and forth:
+        time -= math.floor(time)
+        #Slide out and back as a triangle wave: 0 at time 0, the full length at time 0.5, and 0 again at time 1.
+        distance = (1.0 - abs(2.0 * time - 1.0)) * self._length
+        xy_array[joint_idx, 0] = self.location[0] + distance * self._cos
+        xy_array[joint_idx, 1] = self.location[1] + distance * self._sin
+    
+    def points_for_times(self, times):
+        t = np.asarray(times, dtype=float) * self.speed
+        t -= np.floor(t)
+        distance = (1.0 - np.abs(2.0 * t - 1.0)) * self._length
+        points = np.empty((len(t), 2))
+        points[:, 0] = self.location[0] + distance * self._cos
+        points[:, 1] = self.location[1] + distance * self._sin
+        return points
\ No newline at end of file
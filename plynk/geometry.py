@@ -4,6 +4,10 @@ geometry.py: Useful geometry functions for the simulator.
 
 import math
 
+import numpy as np
+
+from plynk.jit import njit
+
 def circular_intersection(a_center, a_radius, b_center, b_radius):
     """
     circular_intersection: Returns the two intersection points of two circles.
@@ -14,22 +18,79 @@ def circular_intersection(a_center, a_radius, b_center, b_radius):
         b_radius: The radius of circle B
     Returns a list of two points, the intersections of the circle, or None is none exist.
     """
-    x_A, y_A = a_center
-    x_B, y_B = b_center
-    try:
-        L_C = math.sqrt((x_A - x_B)**2 + (y_A - y_B)**2)
-        b = (b_radius**2 - a_radius**2 + L_C**2) / (2 * L_C)
-        h = math.sqrt(b_radius**2 - b**2)
-        x_P = x_B + b * (x_A - x_B) / L_C
-        y_P = y_B + b * (y_A - y_B) / L_C
-        x_1 = x_P + h * (y_B - y_A) / L_C
-        y_1 = y_P - h * (x_B - x_A) / L_C
-        x_2 = x_P - h * (y_B - y_A) / L_C
-        y_2 = y_P + h * (x_B - x_A) / L_C
-    except ValueError:
+    x_1, y_1, x_2, y_2 = circular_intersection_xy(a_center[0], a_center[1], a_radius, b_center[0], b_center[1], b_radius)
+    if math.isnan(x_1):
         return None
     return [(x_1, y_1), (x_2, y_2)]
 
+@njit(cache=True)
+def circular_intersection_xy(x_A, y_A, a_radius, x_B, y_B, b_radius):
+    """
+    circular_intersection_xy: `circular_intersection` on plain numbers, compiled when Numba is available.
+    Parameters:
+        x_A, y_A: The center of circle A.
+        a_radius: The radius of circle A.
+        x_B, y_B: The center of circle B.
+        b_radius: The radius of circle B.
+    Returns a tuple of the X and Y of the first intersection, then of the second, all NaN if none exist.
+    """
+    dx = x_A - x_B
+    dy = y_A - y_B
+    L_C_sq = dx*dx + dy*dy
+    if L_C_sq == 0.0:
+        #Concentric circles have either no intersections or infinitely many.
+        return (np.nan, np.nan, np.nan, np.nan)
+    L_C = math.sqrt(L_C_sq)
+    inv_L_C = 1.0 / L_C
+    b = (b_radius*b_radius - a_radius*a_radius + L_C_sq) * 0.5 * inv_L_C
+    disc = b_radius*b_radius - b*b
+    if disc < 0.0:
+        return (np.nan, np.nan, np.nan, np.nan)
+    h = math.sqrt(disc)
+    b_scale = b * inv_L_C
+    h_scale = h * inv_L_C
+    x_P = x_B + b_scale * dx
+    y_P = y_B + b_scale * dy
+    return (x_P - h_scale * dy, y_P + h_scale * dx, x_P + h_scale * dy, y_P - h_scale * dx)
+
+def circular_intersection_batch(a_centers, a_radii, b_centers, b_radii):
+    """
+    circular_intersection_batch: Vectorized `circular_intersection` over many pairs of circles.
+    Parameters:
+        a_centers: The centers of the A circles as an (N, 2) array.
+        a_radii: The radii of the A circles as a length N array.
+        b_centers: The centers of the B circles as an (N, 2) array.
+        b_radii: The radii of the B circles as a length N array.
+    Returns a tuple of an (N, 2, 2) array, where row i holds the two intersection points of the ith pair
+    in the same order as `circular_intersection`, and a length N boolean array that is False wherever
+    the pair has no intersections. The points of those pairs are NaN.
+    """
+    a_centers = np.asarray(a_centers, dtype=float)
+    b_centers = np.asarray(b_centers, dtype=float)
+    a_radii = np.asarray(a_radii, dtype=float)
+    b_radii = np.asarray(b_radii, dtype=float)
+    dx = a_centers[:, 0] - b_centers[:, 0]
+    dy = a_centers[:, 1] - b_centers[:, 1]
+    L_C_sq = dx*dx + dy*dy
+    separate = L_C_sq > 0.0
+    #Use a dummy length for concentric circles so the division stays finite; they're invalid anyway.
+    inv_L_C = 1.0 / np.sqrt(np.where(separate, L_C_sq, 1.0))
+    b = (b_radii*b_radii - a_radii*a_radii + L_C_sq) * 0.5 * inv_L_C
+    disc = b_radii*b_radii - b*b
+    valid = separate & (disc >= 0.0)
+    h = np.sqrt(np.maximum(disc, 0.0))
+    b_scale = b * inv_L_C
+    h_scale = h * inv_L_C
+    x_P = b_centers[:, 0] + b_scale * dx
+    y_P = b_centers[:, 1] + b_scale * dy
+    points = np.empty((len(dx), 2, 2))
+    points[:, 0, 0] = x_P - h_scale * dy
+    points[:, 0, 1] = y_P + h_scale * dx
+    points[:, 1, 0] = x_P + h_scale * dy
+    points[:, 1, 1] = y_P - h_scale * dx
+    points[~valid] = np.nan
+    return points, valid
+
 def line_extension(endpoint_1, endpoint_2, L):
     """
     line_extension: Given the two endpoints of a line, 
@@ -40,15 +101,38 @@ def line_extension(endpoint_1, endpoint_2, L):
         L: The length of the extension
     Returns the point given by extending the line from endpoint_2 by L.
     """
-    angle = line_angle(endpoint_1, endpoint_2)
-    return (endpoint_2[0] + L * math.cos(angle), endpoint_2[1] + L * math.sin(angle))
+    return line_extension_xy(endpoint_1[0], endpoint_1[1], endpoint_2[0], endpoint_2[1], L)
+
+@njit(cache=True)
+def line_extension_xy(x_1, y_1, x_2, y_2, L):
+    """
+    line_extension_xy: `line_extension` on plain numbers, compiled when Numba is available.
+    Returns the X, Y tuple of the point given by extending the line from (x_2, y_2) by L.
+    """
+    dx = x_2 - x_1
+    dy = y_2 - y_1
+    length = math.hypot(dx, dy)
+    if length == 0.0:
+        #Same direction as line_direction gives.
+        return (x_2 + L, y_2)
+    return (x_2 + L * (dx / length), y_2 + L * (dy / length))
 
 def distance(point1, point2):
     """Calculate the distance between two points.
     
     Returns the distance between point1 and point2.
     """
-    return math.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2)
+    return math.hypot(point1[0] - point2[0], point1[1] - point2[1])
+
+def distance_sq(point1, point2):
+    """Calculate the square of the distance between two points.
+    
+    Cheaper than `distance` when the distance is only compared against something:
+    compare against the square of the threshold instead.
+    """
+    dx = point1[0] - point2[0]
+    dy = point1[1] - point2[1]
+    return dx*dx + dy*dy
 
 def line_angle(endpoint1, endpoint2):
     """Finds the slope of the line defined by the two endpoints as an angle.
@@ -57,8 +141,29 @@ def line_angle(endpoint1, endpoint2):
     """
     return math.atan2(endpoint2[1] - endpoint1[1], endpoint2[0] - endpoint1[0])
 
+def line_direction(endpoint1, endpoint2):
+    """Finds the direction of the line from endpoint1 to endpoint2 without any trigonometry.
+    
+    Returns a tuple of the cosine and sine of `line_angle(endpoint1, endpoint2)`, and the length of the line.
+    """
+    dx = endpoint2[0] - endpoint1[0]
+    dy = endpoint2[1] - endpoint1[1]
+    L = math.hypot(dx, dy)
+    if L == 0.0:
+        #Same as the angle of 0 that line_angle gives.
+        return (1.0, 0.0, 0.0)
+    return (dx / L, dy / L, L)
+
+def law_of_cosines_sq(a, b, gamma):
+    """Use the law of cosines to find the square of the third side of a triangle.
+    a and b are the other two sides, and gamma is the oposite angle (rad).
+    
+    Use this instead of `law_of_cosines` when the side is only compared against a squared length.
+    """
+    return a*a + b*b - 2*a*b*math.cos(gamma)
+
 def law_of_cosines(a, b, gamma):
     """Use the law of cosines to find the third side of a triangle.
     a and b are the other two sides, and gamma is the oposite angle (rad).
     """
-    return math.sqrt(a*a + b*b - 2*a*b*math.cos(gamma))
+    return math.sqrt(law_of_cosines_sq(a, b, gamma))
@@ -0,0 +1,26 @@
+"""
+jit.py: Optional Numba support.
+
+Numba is not required by Plynk. When it is installed, `njit` compiles functions with it in nopython mode;
+when it isn't, `njit` leaves functions as plain Python and `ENABLED` is False so callers can choose a
+path that is fast without compilation.
+"""
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+#Whether functions decorated with `njit` are actually compiled.
+ENABLED = numba is not None
+
+def njit(*args, **kwargs):
+    """Decorator: `numba.njit` if Numba is available, otherwise does nothing.
+
+    Can be used bare (`@njit`) or with Numba options (`@njit(cache=True)`).
+    """
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return njit()(args[0])
+    if numba is None:
+        return lambda function: function
+    return numba.njit(*args, **kwargs)
@@ -1,29 +1,104 @@
+import numpy as np
+
+#Codes for the built in choosers. Joints store these instead of the chooser functions of the same names below.
+CHOOSE_GX = 0
+CHOOSE_GY = 1
+CHOOSE_LX = 2
+CHOOSE_LY = 3
+
+class _Location(object):
+    """The descriptor for `Joint.location`.
+    
+    It has no `__get__`, so reading `location` finds the plain instance attribute without
+    calling any Python code; only assignment comes through here, to also write the joint's row.
+    """
+    def __set__(self, joint, val):
+        #Fixed joints are checked for when a linkage is built, so this is only a debugging aid.
+        assert not joint.fixed, "The location of fixed joints cannot be changed."
+        joint.set_location_dynamic(val)
+
 class Joint(object):
     """The Joint class represents one joint in the linkage mechanism.
     
     Each `Joint` represents one fixed or moving point where bars meet
     in the linkage mechansim.
     
+    A joint's location is stored in a row of a `JointArray`, and mirrored in
+    `location` for fast reading. Until the joint is added to a `Linkage`, which
+    keeps all of its joints in one array, each joint has a one row array of its own.
+    
     Attributes:
         label: A user label.
-        location: The current location of the joint as an X, Y tuple.
+        location: The current location of the joint as an X, Y tuple. Fixed joints must be moved
+                  with `reset_fixed_location`; assigning to their location is only caught when
+                  assertions are enabled.
         fixed: A boolean that indicates if the joint is fixed in space.
         chooser: A function taking two possible locations for the joint
-                 that returns one of them.
+                 that returns one of them, or one of the `CHOOSE_` codes.
+                 The built in chooser functions (`greater_x` etc.) are
+                 replaced with their codes.
     """
+    location = _Location()
     
     def __init__(self, label, location = None, fixed = False, chooser = None):
         self.label = label
-        self.fixed = False
-        self.location = location
         self.fixed = fixed
-        self.chooser = chooser
+        self.chooser = CHOOSER_CODES.get(chooser, chooser)
+        JointArray([self])
+        self.set_location_dynamic(location)
+        
+    def __getstate__(self):
+        #The array holding the location is not part of the joint; `location` is enough to rebuild it.
+        state = self.__dict__.copy()
+        for name in ('_arr', '_idx', '_xy'):
+            del state[name]
+        return state
+    
+    def __setstate__(self, state):
+        state = state.copy()
+        location = state.pop('location')
+        self.__dict__.update(state)
+        JointArray([self])
+        self.set_location_dynamic(location)
+    
+    def clone(self):
+        """Returns a new joint with the same label, location, fixedness and chooser, in an array of its own."""
+        return Joint(self.label, self.location, self.fixed, self.chooser)
+    
+    def _bind(self, arr, idx):
+        """Move the joint's location into row `idx` of `JointArray` `arr`."""
+        if '_arr' in self.__dict__ and self._arr is not arr:
+            self._arr.moved_out = True
+        self._arr = arr
+        self._idx = idx
+        #A view of the row, so writes go straight to the array.
+        self._xy = arr.xy[idx]
+        location = self.__dict__.get('location')
+        if location is not None:
+            self._xy[0], self._xy[1] = location
+    
+    def set_location_dynamic(self, location):
+        """Assign `location` without checking that the joint isn't fixed.
         
-    def __setattr__(self, pname, val):
-        if(pname == "location" and self.fixed):
-            raise AttributeError("The location of fixed joints cannot be changed.")
+        For simulation code that already knows the joint is dynamic. Every assignment of `location`,
+        including `set_location` and `reset_fixed_location`, comes through here.
+        Returns nothing.
+        """
+        if location is None:
+            self._xy.fill(np.nan)
+            self.__dict__['location'] = None
         else:
-            object.__setattr__(self, pname, val)
+            x, y = location
+            self._xy[0] = x
+            self._xy[1] = y
+            self.__dict__['location'] = (x, y)
+            
+    def array_row(self):
+        """Returns the `JointArray` holding the joint's location, and the joint's row in it.
+        
+        Code writing to the row directly must call the array's `changed` afterwards.
+        """
+        return self._arr, self._idx
             
     def __repr__(self):
         return str(self)
@@ -36,29 +111,104 @@ class Joint(object):
     
     def is_known(self):
         """Returns whether the location of the joint is known."""
-        return self.location != None
+        return self.location is not None
     
     def set_location(self, location1, location2 = None):
         """If necissary, chooses location1 or location2, and then assigns it as the joint's location.
         
+        Like `set_location_dynamic`, this does not check that the joint isn't fixed.
+        
         Parameters:
             location1: A possible location, as an XY-tuple.
             location2: A possible location, as an XY-tuple. If ommited, location1 will be used unconditionally.
             
         Returns nothing.
         """
+        chooser = self.chooser
         if(location2 == None):
-            self.location = location1
-        elif(self.chooser != None):
-            self.location = self.chooser(location1, location2)
-        else:
+            self.set_location_dynamic(location1)
+        elif(chooser == None):
             raise ValueError("Joint %s does not have a chooser function. Calling choose_location is therefore invalid." % self.label)
+        elif(chooser == CHOOSE_GX):
+            self.set_location_dynamic(location1 if location1[0] > location2[0] else location2)
+        elif(chooser == CHOOSE_GY):
+            self.set_location_dynamic(location1 if location1[1] > location2[1] else location2)
+        elif(chooser == CHOOSE_LX):
+            self.set_location_dynamic(location1 if location1[0] < location2[0] else location2)
+        elif(chooser == CHOOSE_LY):
+            self.set_location_dynamic(location1 if location1[1] < location2[1] else location2)
+        else:
+            self.set_location_dynamic(chooser(location1, location2))
         
     def reset_fixed_location(self, newloc):
         """Override the assignment guard for location on fixed joints."""
         if not self.fixed:
             raise ValueError("Calling reset_fixed_location on a dynamic joint is meaningless.")
-        object.__setattr__(self, "location", newloc)
+        self.set_location_dynamic(newloc)
+        
+class JointArray(object):
+    """Contiguous storage for the locations of a set of joints.
+    
+    Creating a `JointArray` moves the locations of its joints into it; from then on, each
+    joint's `location` reads and writes its row of `xy`.
+    
+    Attributes:
+        joints: The joints stored, in row order.
+        xy: An (N, 2) float array of the joint locations. Rows of unknown joints are NaN.
+        index: A dictionary mapping joint labels to rows.
+        moved_out: Whether any of `joints` has been moved into another array since this one was
+                   made or last called `reclaim`.
+    """
+    
+    def __init__(self, joints):
+        self.joints = list(joints)
+        self.xy = np.full((len(self.joints), 2), np.nan)
+        self.index = dict((j.label, i) for i, j in enumerate(self.joints))
+        self.moved_out = False
+        for i, j in enumerate(self.joints):
+            j._bind(self, i)
+            
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        #Unpickled joints get arrays of their own, so take them back the next time they're needed.
+        self.moved_out = True
+            
+    def changed(self, rows = None):
+        """Update the `location` of the joints whose rows of `xy` were written directly.
+        
+        Code writing to `xy` directly must call this afterwards.
+        
+        Parameters:
+            rows: The rows written, or None for all of them.
+            
+        Returns nothing.
+        """
+        joints = self.joints
+        xy = self.xy
+        if rows is None or 4 * len(rows) > len(joints):
+            #For a good share of the rows, one conversion of the whole array is cheaper than one per row.
+            locations = xy.tolist()
+            located = ((row, locations[row]) for row in (range(len(joints)) if rows is None else rows))
+        else:
+            #For a few rows, such as a driver's, converting only those keeps the cost from growing with the array.
+            located = ((row, xy[row].tolist()) for row in rows)
+        for row, (x, y) in located:
+            joint = joints[row]
+            #A joint moved into another array no longer reads from this one.
+            if joint._arr is self:
+                #Unknown locations are stored as NaN.
+                joint.__dict__['location'] = None if x != x else (x, y)
+        
+    def reclaim(self):
+        """Move any of `joints` that have been moved into another array back into their rows, with their current locations.
+        
+        A joint shared by two linkages lives in the array of whichever used it last.
+        Returns nothing.
+        """
+        for i, j in enumerate(self.joints):
+            if j._arr is not self:
+                j._bind(self, i)
+        self.moved_out = False
     
         
 def greater_x(point1, point2):
@@ -75,4 +225,9 @@ def lesser_x(point1, point2):
 
 def lesser_y(point1, point2):
     """Chooses the point with the lesser y coordinate."""
-    return point1 if point1[1] < point2[1] else point2
\ No newline at end of file
+    return point1 if point1[1] < point2[1] else point2
+
+CHOOSER_CODES = {greater_x : CHOOSE_GX,
+                 greater_y : CHOOSE_GY,
+                 lesser_x : CHOOSE_LX,
+                 lesser_y : CHOOSE_LY}
\ No newline at end of file
@@ -1,15 +1,36 @@
-import geometry, math, re, copy
+import geometry, jit, math, re
+
+import numpy as np
 
 from bar import Bar, Joint
+from joint import JointArray, CHOOSE_GX, CHOOSE_GY, CHOOSE_LX, CHOOSE_LY
 from driver import Driver
+from solver import FramePlan
+
+from collections import deque
+from itertools import combinations, product, tee
 
-from itertools import repeat, combinations, product, tee, izip
+#The conditions under which each built in chooser picks the first of two intersections, in terms of the
+#variables of the straight line simulation function.
+_CHOOSER_CONDITIONS = {CHOOSE_GX : "x_1 > x_2",
+                       CHOOSE_GY : "y_1 > y_2",
+                       CHOOSE_LX : "x_1 < x_2",
+                       CHOOSE_LY : "y_1 < y_2"}
 
-def pairwise(iterable):
-    "s -> (s0,s1), (s1,s2), (s2, s3), ..."
-    a, b = tee(iterable)
-    next(b, None)
-    return izip(a, b)
+try:
+    #Python 3.10 and later have this built in, implemented in C.
+    from itertools import pairwise
+except ImportError:
+    try:
+        from itertools import izip as _lazy_zip
+    except ImportError:
+        _lazy_zip = zip
+    
+    def pairwise(iterable):
+        "s -> (s0,s1), (s1,s2), (s2, s3), ..."
+        a, b = tee(iterable)
+        next(b, None)
+        return _lazy_zip(a, b)
 
 class Linkage(object):
     """A `Linkage` represents a linkage mechanism.
@@ -38,8 +59,15 @@ class Linkage(object):
                  the bars and drivers. A list of `Joint` objects.
                  
         drivers: The drivers of the linage. A list of `Driver` objects.
+        
+    joint_array: A `JointArray` holding the locations of `joints`. Rebuilt whenever `joints` is assigned.
+                 Joints shared with another linkage are moved back into it when this one is simulated.
+    
+          cache: The locations of the dynamic joints at each cached simulator time, as a
+                 (cache_accuraccy + 1, dynamic joints, 2) array, or None when invalidated.
     """
     def __init__(self, bars, joints, drivers):
+        self._cache_array = None
         self.supress_validity = True
         
         self.bars = bars
@@ -48,22 +76,36 @@ class Linkage(object):
         
         self.supress_validity = False
         
-        self.cache = {}
+        self.cache = None
         self.cache_accuraccy = 10000
         
         self.validity_check()
         
     def __setattr__(self, aname, value):
         object.__setattr__(self, aname, value)
+        if aname == 'joints':
+            self.bind_joints()
         if aname in ['bars', 'joints', 'drivers']:
             if(not self.supress_validity):
                 self.validity_check()
             self.invalidate_caches()
         
+    def bind_joints(self):
+        """Move the locations of `joints` into a new `JointArray`, `joint_array`."""
+        self.joint_array = JointArray(self.joints)
+        
     def invalidate_caches(self):
         """Invalidate cached simulation functions and data."""
         self.simulation_function = None
         self.cache = None
+        self._rebuild_adjacency()
+        
+    def _rebuild_adjacency(self):
+        """Rebuild the map from each joint to the bars connected to it, used by `bars_connected_to_joint`."""
+        self._joint_to_bars = {}
+        for bar in self.bars:
+            for joint in set(bar.joints):
+                self._joint_to_bars.setdefault(joint, []).append(bar)
             
     def validity_check(self):
         """Does preliminary checks of validity and joint reference.
@@ -71,16 +113,19 @@ class Linkage(object):
         Throws ValueError on any problems found, or returns True if none found.
         """
         #-- Validity Checks --
-        joint_references = dict(zip(self.joints, repeat(0)))
+        joint_set = set(self.joints)
         #Check that no bars reference unknown joints.
         for bar in self.bars:
             for joint in bar.joints:
-                if joint not in self.joints:
+                if joint not in joint_set:
                     raise ValueError("Bar %s references a Joint \"%s\" not in the linkage's joint list." % (bar.label, joint.label))
         #Check that no drivers reference unknown joints.
         for d in self.drivers:
-            if d.attachment_joint not in self.joints:
+            if d.attachment_joint not in joint_set:
                 raise ValueError("Driver %s references a Joint \"%s\" not in the linkage's joint list." % (d.label, d.attachment_joint.label))
+            #Drivers move their joints without checking, so catch this here.
+            if d.attachment_joint.fixed:
+                raise ValueError("Driver %s is attached to the fixed Joint \"%s\"." % (d.label, d.attachment_joint.label))
         return True
             
     def simulate_to_time(self, time):
@@ -99,26 +144,63 @@ class Linkage(object):
         #Validate the time parameter
         if(not 0 <= time <= 1):
             raise ValueError("Simulator time `time` must be between 0 and 1, cannot be %s" % time)
-        cache_time = math.floor(self.cache_accuraccy * time)
-        if(self.cache != None and cache_time in self.cache):
-            #There's a cache entry, use it:
-            for joint in self.cache[cache_time]:
-                joint.set_location(self.cache[cache_time][joint])
+        #Joints shared with another linkage may have been moved into its array since we last simulated.
+        #They go back into the same rows, so the simulation function and cache stay valid.
+        if(self.joint_array.moved_out):
+            self.joint_array.reclaim()
+        if(self.cache is None or len(self.cache) != self.cache_accuraccy + 1):
+            self._reset_cache()
+        #time is never negative, so truncating is the same as flooring:
+        cache_time = int(self.cache_accuraccy * time)
+        xy = self.joint_array.xy
+        rows = self._cache_rows
+        if(self._cache_valid[cache_time]):
+            #There's a cache entry, copy it into the joints' rows:
+            xy[rows] = self.cache[cache_time]
+            self.joint_array.changed(self._cache_row_list)
             return None
         else:
             #No cache entry.
-            if self.cache == None:
-                self.cache = {}
             if(self.simulation_function == None):
                 self.simulation_function = self.generate_simulation_function()
             self.simulation_function(time)
             #Cache the current state:
-            cache_state = {}
-            for joint in [joint for joint in self.joints if not joint.fixed]:
-                cache_state[joint] = joint.location
-            self.cache[cache_time] = cache_state
+            self.cache[cache_time] = xy[rows]
+            self._cache_valid[cache_time] = True
             return None
         
+    def _reset_cache(self):
+        """Empty `cache`, reusing the previous array when it is still the right shape."""
+        rows = np.array([row for row, joint in enumerate(self.joint_array.joints) if not joint.fixed], dtype=np.intp)
+        shape = (self.cache_accuraccy + 1, len(rows), 2)
+        if(self._cache_array is None or self._cache_array.shape != shape):
+            self._cache_array = np.empty(shape)
+            self._cache_valid = np.zeros(shape[0], dtype=bool)
+        else:
+            self._cache_valid.fill(False)
+        #The rows of `joint_array` that are cached:
+        self._cache_rows = rows
+        self._cache_row_list = rows.tolist()
+        self.cache = self._cache_array
+        
+        
+    def precompute(self, times):
+        """Precompute the driver positions for a batch of simulator times that are about to be simulated.
+        
+        Does nothing when the simulation is compiled, since it computes the driver positions itself.
+        
+        Parameters:
+            times: A sequence of simulator times, or None to discard precomputed positions.
+            
+        Returns nothing.
+        """
+        if(times is not None):
+            if(self.simulation_function == None):
+                self.simulation_function = self.generate_simulation_function()
+            if(getattr(self.simulation_function, 'compiled', False)):
+                return
+        for driver in self.drivers:
+            driver.precompute(times)
         
     def generate_simulation_function(self, validity_margin = 0.001):
         """Create a simulation function for the current configuration of the linkage.
@@ -128,41 +210,47 @@ class Linkage(object):
         Returns a function taking a `time` parameter.
         """
         def solver_for_intersection(unknown_joint, known_joints, bars):
-            a = known_joints[0]
-            b = known_joints[1]
-            a_bar = next(bar for bar in bars if a in bar.joints)
-            b_bar = next(bar for bar in bars if b in bar.joints)
+            #known_joints[i] is on bars[i], as is unknown_joint.
+            a, b = known_joints
+            a_bar, b_bar = bars
+            a_radius = a_bar.joint_distance(unknown_joint, a)
+            b_radius = b_bar.joint_distance(unknown_joint, b)
             def solver(time):
-                loc = (geometry.circular_intersection(a.location,
-                                                      a_bar.joint_distance(unknown_joint, a),
-                                                      b.location,
-                                                      b_bar.joint_distance(unknown_joint, b)))
-                if(loc == None):
+                x_A, y_A = a.location
+                x_B, y_B = b.location
+                x_1, y_1, x_2, y_2 = geometry.circular_intersection_xy(x_A, y_A, a_radius, x_B, y_B, b_radius)
+                if(math.isnan(x_1)):
                     raise InvalidLinkageError("No physically possible intersections for joint %s can be found from joints %s an %s using bars %s and %s." %
                                               (unknown_joint, a, b, a_bar.label, b_bar.label))
-                unknown_joint.set_location(*loc)
+                unknown_joint.set_location((x_1, y_1), (x_2, y_2))
             solver.solver_type = "intersection"
+            solver.solver_args = (unknown_joint, a, a_radius, b, b_radius)
             return solver
         
         def solver_for_joint_on_bar_given_joints(joint, bar, joints):
+            extension = bar.origin_distance(joint) - bar.origin_distance(joints[1])
             def solver(time):
-                joint.set_location(geometry.line_extension(joints[0].location,
-                                                           joints[1].location,
-                                                           bar.origin_distance(joint) - bar.origin_distance(joints[1])))
+                x_1, y_1 = joints[0].location
+                x_2, y_2 = joints[1].location
+                joint.set_location(geometry.line_extension_xy(x_1, y_1, x_2, y_2, extension))
             solver.solver_type = "extension"
+            solver.solver_args = (joint, joints[0], joints[1], extension)
             return solver
         
         #Create a set representing the joints that the algorithm has "solved"
         #up to this point. This starts off as all fixed joints, and all joints attached to drivers.
         solved_joints = set([driver.attachment_joint for driver in self.drivers]) | set([joint for joint in self.joints if joint.fixed])
+        #And the joints that haven't been solved yet, kept up to date alongside it.
+        unsolved_joints = set(self.joints) - solved_joints
         
-        #A list mapping sets of joints representing the joints that must be known to find another joint using the given solver.
-        #The values are tuples of the form (requirement_set, joint, solver) where joint is the joint that will be solved when solver is run.
+        #A list of the ways each joint can be solved, as tuples of the form (requirement_set, joint, make_solver, solver_args).
+        #requirement_set is the set of joints that must be known to find `joint`, and `make_solver(*solver_args)` makes the
+        #solver function that finds it. Only the solvers that get used are made.
         requirements_to_functions = []
         
         #Step 1: Find all posible solvers for all unknown points.
         #Now we need to find every way all of the unknown joints could possibly be found.
-        for joint in set(self.joints) - solved_joints:
+        for joint in [joint for joint in self.joints if joint in unsolved_joints]:
             bars = self.bars_connected_to_joint(joint)
             #Find all linear extension solving posibilities
             for bar in [bar for bar in bars if len(bar.joints) > 2]:
@@ -174,7 +262,7 @@ class Linkage(object):
                 other_joints.remove(joint)
                 #Find all pairs of the other joints, and insert an entry for each.
                 for pair in combinations(other_joints, 2):
-                    s = (frozenset(pair), joint, solver_for_joint_on_bar_given_joints(joint, bar, other_joints))
+                    s = (frozenset(pair), joint, solver_for_joint_on_bar_given_joints, (joint, bar, pair))
                     requirements_to_functions.append(s)
             
             #Find all circular intersection solving possibilities
@@ -187,87 +275,157 @@ class Linkage(object):
                 b1_joints -= set([joint])
                 b2_joints -= set([joint])
                 for joint_pair in product(b1_joints, b2_joints):
-                    requirements_to_functions.append((frozenset(joint_pair), joint, solver_for_intersection(joint, joint_pair, bar_pair)))
+                    requirements_to_functions.append((frozenset(joint_pair), joint, solver_for_intersection, (joint, joint_pair, bar_pair)))
         
         #Define the list of functions that will be invoked in order by the final simulation function.
         #When invoked, each function will be passed the current simulated time.
         #This starts as the driver update functions of all the drivers.
         function_list = [driver.update_attachment_point for driver in self.drivers]
         
-        #Step 2: Iteration by iteration, find the solvers whose requirements have been met
-        #and add them to the list in order.
-        while(True):
-            round_solved = False
-            #Define a mutable copy of the requirements/functions dictionary
-            #that can be modified during iteration.
-            new_requirements_to_functions = requirements_to_functions[:]
-            for solver in requirements_to_functions:
-                if(solver[0].issubset(solved_joints)):
-                    if not solver[1] in solved_joints:
-                        #Indicate that at least one joint has been solved this iteration:
-                        round_solved = True
-                        #Add the solver function to the function list:
-                        function_list.append(solver[2])
-                        #Add the solved joint to the solved joints set:
-                        solved_joints.add(solver[1])
-                        #Remove the function and it's requriements from the requirements/functions dictionary.
-                        new_requirements_to_functions.remove(solver)
-            #Update the original to the copy.
-            requirements_to_functions = new_requirements_to_functions
-            #Check if all points have been solved:
-            if(solved_joints == set(self.joints)):
-                #If they have, just break. The function_list is now complete,
-                #and the simulation function just needs to be defined.
-                break
-            #If we made no progress this round, and the linkage hasen't been solved,
-            #whatever joints remain are unsolvable.
-            if(not round_solved):
-                unsolvable_joints = set(self.joints) - solved_joints
-                raise InvalidLinkageError("Some joints cannot be solved because they are ambiguous, or are unconnected to the linkage.\
-                                          Unknown joints: %s" % ", ".join([str(joint) for joint in unsolvable_joints]))
+        #Step 2: Order the solvers with Kahn's algorithm. Each solver waits on a count of its unsolved
+        #required joints; whenever a joint is solved, the counts of the solvers that need it go down,
+        #and the first solver to reach zero for a still unsolved joint is the one used for it.
+        waiting_on = [len(s[0]) for s in requirements_to_functions]
+        #Map each joint to the indices of the solvers requiring it:
+        required_by = {}
+        for index, solver in enumerate(requirements_to_functions):
+            for required_joint in solver[0]:
+                required_by.setdefault(required_joint, []).append(index)
+        queue = deque(joint for joint in self.joints if joint in solved_joints)
+        #Stop as soon as every joint has a solver, rather than draining the queue.
+        while(queue and unsolved_joints):
+            for index in required_by.get(queue.popleft(), ()):
+                requirements, solved_joint, make_solver, solver_args = requirements_to_functions[index]
+                #Once a joint has a solver, its other solvers are never needed.
+                if solved_joint in solved_joints:
+                    continue
+                waiting_on[index] -= 1
+                if(waiting_on[index] == 0):
+                    #Make the solver function, and add it to the function list:
+                    function_list.append(make_solver(*solver_args))
+                    #Add the solved joint to the solved joints set, and let the solvers needing it know:
+                    solved_joints.add(solved_joint)
+                    unsolved_joints.discard(solved_joint)
+                    queue.append(solved_joint)
+        #Whatever joints remain are unsolvable.
+        if(unsolved_joints):
+            raise InvalidLinkageError("Some joints cannot be solved because they are ambiguous, or are unconnected to the linkage.\
+                                      Unknown joints: %s" % ", ".join([str(joint) for joint in unsolved_joints]))
                 
-        def sim_function(time):
-            for function in function_list:
-                function(time)
+        #The segments between neighbouring joints on every bar, as rows of joint_array and the length each should be:
+        rows = dict((joint, row) for row, joint in enumerate(self.joint_array.joints))
+        bar_segments = [(bar, joints[0], joints[1]) for bar in self.bars for joints in pairwise(bar.joints)]
+        pair_i = np.array([rows[j1] for bar, j1, j2 in bar_segments], dtype=np.int32)
+        pair_j = np.array([rows[j2] for bar, j1, j2 in bar_segments], dtype=np.int32)
+        expected = np.array([bar.joint_distance(j1, j2) for bar, j1, j2 in bar_segments], dtype=np.float64)
+        xy = self.joint_array.xy
+        
+        def check_bars():
             #Do a validity check for elastic bars:
-            for bar in self.bars:
-                for joints in pairwise(bar.joints):
-                    p1 = joints[0].location
-                    p2 = joints[1].location
-                    real_dist = geometry.distance(p1, p2)
-                    dist = bar.joint_distance(joints[0], joints[1])
-                    if not abs(dist - real_dist) < validity_margin:
-                        raise InvalidLinkageError("Distance constraint of %s units from bar %s between joints %s and %s cannot be satisfied." % (dist, bar.label, joints[0].label, joints[1].label))
-                
+            d = xy[pair_i] - xy[pair_j]
+            real = np.hypot(d[:, 0], d[:, 1])
+            stretched = ~(np.abs(expected - real) < validity_margin)
+            if stretched.any():
+                bar, j1, j2 = bar_segments[stretched.argmax()]
+                dist = bar.joint_distance(j1, j2)
+                raise InvalidLinkageError("Distance constraint of %s units from bar %s between joints %s and %s cannot be satisfied." % (dist, bar.label, j1.label, j2.label))
+        
+        sim_function = self._straight_line_function(function_list, rows, check_bars)
+        
+        #With Numba, simulate whole frames with compiled code when the linkage allows it.
+        #Without it, the closures above are faster than running solve_frame as Python.
+        if jit.ENABLED:
+            plan = FramePlan.for_solvers(self.joint_array, self.drivers, function_list[len(self.drivers):],
+                                         pair_i, pair_j, expected, validity_margin)
+            if plan != None:
+                def compiled_sim_function(time):
+                    if not plan.solve(time):
+                        #Rerun the frame in Python to raise the appropriate error.
+                        sim_function(time)
+                #Drivers are only run by this when a frame fails, so there's no use precomputing them.
+                compiled_sim_function.compiled = True
+                return compiled_sim_function
+        
         return sim_function
+    
+    def _straight_line_function(self, function_list, rows, check_bars):
+        """Write the solver functions out as the source of one function, and compile it.
+        
+        Each intersection and extension solver becomes a few lines reading its joints' rows of `joint_array`
+        with its bar lengths written in as constants, so a frame runs without calling the solver closures.
         
-    def copy(self, shared_joints = [], shared_drivers = [], joint_indic = ''):
+        Parameters:
+            function_list: The driver and solver functions, in the order they must run.
+            rows: A dictionary mapping joints to their rows in `joint_array`.
+            check_bars: A function raising `InvalidLinkageError` if any bar has been stretched.
+            
+        Returns a function taking a `time` parameter.
+        """
+        namespace = {'_ci' : geometry.circular_intersection_xy,
+                     '_le' : geometry.line_extension_xy,
+                     '_xy' : self.joint_array.xy,
+                     '_joints' : self.joint_array.joints,
+                     '_functions' : function_list,
+                     '_check_bars' : check_bars}
+        lines = ["def sim_function(time):"]
+        for index, function in enumerate(function_list):
+            solver_type = getattr(function, "solver_type", None)
+            if solver_type == "intersection":
+                target, a, a_radius, b, b_radius = function.solver_args
+                lines.append("    x_A, y_A = _xy[%d].tolist()" % rows[a])
+                lines.append("    x_B, y_B = _xy[%d].tolist()" % rows[b])
+                lines.append("    x_1, y_1, x_2, y_2 = _ci(x_A, y_A, %r, x_B, y_B, %r)" % (float(a_radius), float(b_radius)))
+                #On failure, run the solver itself to raise its error.
+                lines.append("    if x_1 != x_1:")
+                lines.append("        _functions[%d](time)" % index)
+                condition = _CHOOSER_CONDITIONS.get(target.chooser) if isinstance(target.chooser, int) else None
+                if condition is not None:
+                    #Make the choice here rather than going through `set_location` to look up the chooser.
+                    lines.append("    _joints[%d].set_location_dynamic((x_1, y_1) if %s else (x_2, y_2))" % (rows[target], condition))
+                else:
+                    lines.append("    _joints[%d].set_location((x_1, y_1), (x_2, y_2))" % rows[target])
+            elif solver_type == "extension":
+                target, j1, j2, extension = function.solver_args
+                lines.append("    x_1, y_1 = _xy[%d].tolist()" % rows[j1])
+                lines.append("    x_2, y_2 = _xy[%d].tolist()" % rows[j2])
+                lines.append("    _joints[%d].set_location(_le(x_1, y_1, x_2, y_2, %r))" % (rows[target], float(extension)))
+            else:
+                #Drivers are left as they are.
+                lines.append("    _functions[%d](time)" % index)
+        lines.append("    _check_bars()")
+        exec compile("\n".join(lines) + "\n", "<simulation of linkage>", "exec") in namespace
+        return namespace['sim_function']
+        
+    def copy(self, shared_joints = (), shared_drivers = (), joint_indic = ''):
+        """Copy the linkage.
+        
+        Parameters:
+            shared_joints: Joints to use in the copy as they are, rather than copying them.
+            shared_drivers: Drivers to use in the copy as they are. Their attachment joints are shared too.
+            joint_indic: A string appended to the labels of copied joints.
+            
+        Returns a new `Linkage`.
+        """
+        shared_joints = list(shared_joints) + [d.attachment_joint for d in shared_drivers]
         mapping = {}
-        shared_joints.extend([d.attachment_joint for d in shared_drivers])
+        joints = []
         for j in shared_joints:
-            mapping[j] = j
-        joints = shared_joints[:]
-        for j in set(self.joints) - set(shared_joints):
-            newj = copy.deepcopy(j)
+            if j not in mapping:
+                mapping[j] = j
+                joints.append(j)
+        for j in self.joints:
+            if j in mapping:
+                continue
+            newj = j.clone()
             newj.label = newj.label + joint_indic
             joints.append(newj)
             mapping[j] = newj
-        bars = []
-        for bar in self.bars:
-            newbar = copy.deepcopy(bar)
-            newjoints = []
-            for oldj in bar.joints:
-                if oldj in mapping:
-                    newjoints.append(mapping[oldj])
-                else:
-                    newjoints.append(oldj)
-            newbar.joints = newjoints
-            bars.append(newbar)
-        drivers = shared_drivers[:]
-        for d in set(self.drivers) - set(shared_drivers):
-            newd = copy.deepcopy(d)
-            newd.attachment_joint = mapping[d.attachment_joint]
-            drivers.append(newd)
+        #Build new bars rather than copying the old ones so they use the new joints.
+        bars = [bar.clone(mapping) for bar in self.bars]
+        drivers = list(shared_drivers)
+        for d in self.drivers:
+            if d not in drivers:
+                drivers.append(d.clone(mapping))
         return Linkage(bars, joints, drivers)
         
     def joints_connected_to_joint(self, joint):
@@ -291,7 +449,7 @@ class Linkage(object):
             
         Returns a list of bars.
         """
-        return [bar for bar in self.bars if joint in bar.joints]
+        return list(self._joint_to_bars.get(joint, ()))
         
     def translate(self, dx, dy):
         """Translate the linkage by a given transform."""
@@ -299,6 +457,7 @@ class Linkage(object):
             driver.location = (driver.location[0] + dx, driver.location[1] + dy)
         for joint in [j for j in self.joints if j.fixed == True]:
             joint.reset_fixed_location((joint.location[0] + dx, joint.location[1] + dy)) 
+        self.invalidate_caches()
         
     def j(self, label):
         """Return the joint with the given label.
@@ -307,6 +466,10 @@ class Linkage(object):
         
         If more than one joint has the label, it is undefined which is returned.
         """
+        i = self.joint_array.index.get(label)
+        if(i != None and self.joint_array.joints[i].label == label):
+            return self.joint_array.joints[i]
+        #The label may have changed since the array was made.
         return next((j for j in self.joints if j.label == label), None)
     
     def js(self, pattern):
@@ -314,7 +477,8 @@ class Linkage(object):
         
         pattern is a string to be compiled to a regex.
         """
-        return [j for j in self.joints if re.match(pattern, j.label) != None]
+        match = re.compile(pattern).match
+        return [j for j in self.joints if match(j.label) != None]
     
     def b(self, label):
         """Return the bar with a given label.
@@ -323,12 +487,13 @@ class Linkage(object):
         """
         return next(b for b in self.bars if b.label == label)
     
-    def bs(self, label):
-        """Return all joints with labels matching pattern.
+    def bs(self, pattern):
+        """Return all bars with labels matching pattern.
         
         pattern is a string to be compiled to a regex.
         """
-        return [b for b in self.bars if re.match(patter, b.label) != None]
+        match = re.compile(pattern).match
+        return [b for b in self.bars if match(b.label) != None]
     
 class InvalidLinkageError(Exception):
     """The given bars result in a physically impossible situation."""
@@ -0,0 +1,227 @@
+"""
+solver.py: Array based simulation of whole linkage frames.
+
+`Linkage.generate_simulation_function` works out the order in which joints can be solved as a list of
+Python closures. A `FramePlan` flattens the drivers and those solvers into arrays, so that `solve_frame`
+can simulate one time step without touching any Python objects. With Numba installed, `solve_frame`
+and the helpers it uses are compiled (see `plynk.jit`).
+"""
+
+import math
+
+import numpy as np
+
+from plynk.joint import CHOOSE_GX, CHOOSE_GY, CHOOSE_LX
+from plynk.jit import njit
+from plynk.geometry import circular_intersection_xy, line_extension_xy
+from plynk.driver.crank import Crank
+from plynk.driver.rocker import Rocker
+from plynk.driver.slider import Slider
+
+#Driver kinds:
+CRANK = 0
+ROCKER = 1
+SLIDER = 2
+
+#Solver step kinds:
+INTERSECTION = 0
+EXTENSION = 1
+
+#Chooser code for joints without a chooser:
+NO_CHOOSER = -1
+
+#One solver step, laid out like a C struct so that each step `solve_frame` runs is read from one place:
+#    a_param, b_param: The radii around joints a and b for intersections, or the extension length and 0.
+#    target, a, b: The rows of the joint being solved and of the two joints it is solved from.
+#    kind, chooser: The step kind, and the chooser code of the target joint.
+STEP_DTYPE = np.dtype([('a_param', np.float64), ('b_param', np.float64),
+                       ('target', np.int32), ('a', np.int32), ('b', np.int32),
+                       ('kind', np.int8), ('chooser', np.int8)], align=True)
+
+#Results of `solve_frame`:
+SOLVED = 0
+NO_INTERSECTION = 1
+MISSING_CHOOSER = 2
+BAR_STRETCHED = 3
+
+@njit(cache=True)
+def _reduced_time(time, speed):
+    #The speed-adjusted time, reduced to the range 0.0 to 1.0.
+    t = time * speed
+    return t - math.floor(t)
+
+@njit(cache=True)
+def _crank_point(params, time):
+    #params: speed, x, y, length, starting angle (rad)
+    angle = params[4] + time * params[0] * 2 * math.pi
+    return (params[1] + params[3] * math.cos(angle), params[2] + params[3] * math.sin(angle))
+
+@njit(cache=True)
+def _rocker_point(params, time):
+    #params: speed, x, y, length, starting angle (rad), sweep (rad)
+    t = _reduced_time(time, params[0])
+    angle = params[4] + (1.0 - abs(2.0 * t - 1.0)) * params[5]
+    return (params[1] + params[3] * math.cos(angle), params[2] + params[3] * math.sin(angle))
+
+@njit(cache=True)
+def _slider_point(params, time):
+    #params: speed, x, y, length, cos, sin
+    t = _reduced_time(time, params[0])
+    distance = (1.0 - abs(2.0 * t - 1.0)) * params[3]
+    return (params[1] + distance * params[4], params[2] + distance * params[5])
+
+@njit(cache=True)
+def _choose(chooser, x_1, y_1, x_2, y_2):
+    #Same choices as Joint.set_location.
+    if chooser == CHOOSE_GX:
+        first = x_1 > x_2
+    elif chooser == CHOOSE_GY:
+        first = y_1 > y_2
+    elif chooser == CHOOSE_LX:
+        first = x_1 < x_2
+    else:
+        first = y_1 < y_2
+    if first:
+        return (x_1, y_1)
+    return (x_2, y_2)
+
+@njit(cache=True)
+def solve_frame(time,
+                driver_kind, driver_joint, driver_params,
+                steps,
+                pair_i, pair_j, pair_length, margin,
+                xy):
+    """Simulate one frame, writing the solved joint locations into `xy`.
+
+    Returns a tuple of a result code and the index of the step or bar pair that failed, if any.
+    """
+    for d in range(len(driver_kind)):
+        kind = driver_kind[d]
+        if kind == CRANK:
+            point = _crank_point(driver_params[d], time)
+        elif kind == ROCKER:
+            point = _rocker_point(driver_params[d], time)
+        else:
+            point = _slider_point(driver_params[d], time)
+        xy[driver_joint[d], 0] = point[0]
+        xy[driver_joint[d], 1] = point[1]
+    for s in range(len(steps)):
+        step = steps[s]
+        a = step.a
+        b = step.b
+        if step.kind == INTERSECTION:
+            x_1, y_1, x_2, y_2 = circular_intersection_xy(xy[a, 0], xy[a, 1], step.a_param,
+                                                          xy[b, 0], xy[b, 1], step.b_param)
+            if math.isnan(x_1):
+                return (NO_INTERSECTION, s)
+            if step.chooser == NO_CHOOSER:
+                return (MISSING_CHOOSER, s)
+            point = _choose(step.chooser, x_1, y_1, x_2, y_2)
+        else:
+            point = line_extension_xy(xy[a, 0], xy[a, 1], xy[b, 0], xy[b, 1], step.a_param)
+        xy[step.target, 0] = point[0]
+        xy[step.target, 1] = point[1]
+    #Check for elastic bars:
+    for p in range(len(pair_i)):
+        dx = xy[pair_i[p], 0] - xy[pair_j[p], 0]
+        dy = xy[pair_i[p], 1] - xy[pair_j[p], 1]
+        if not abs(pair_length[p] - math.sqrt(dx*dx + dy*dy)) < margin:
+            return (BAR_STRETCHED, p)
+    return (SOLVED, 0)
+
+def _driver_params(driver):
+    """Returns the driver kind and parameter row for a driver, or None if it can't be used by `solve_frame`."""
+    kind = type(driver)
+    params = np.zeros(6)
+    params[0] = driver.speed
+    params[1:3] = driver.location
+    if kind is Crank:
+        params[3:5] = (driver.length, driver.starting_angle)
+        return CRANK, params
+    elif kind is Rocker:
+        params[3:6] = (driver.length, driver._starting_radians, driver._sweep_radians)
+        return ROCKER, params
+    elif kind is Slider:
+        params[3:6] = (driver._length, driver._cos, driver._sin)
+        return SLIDER, params
+    return None
+
+class FramePlan(object):
+    """The array form of a linkage's simulation function.
+
+    A plan solves directly into the `JointArray` of the linkage's joints, but it copies the driver
+    parameters when it is made, so it must be rebuilt whenever the linkage changes.
+
+    Attributes:
+        joint_array: The `JointArray` solved into.
+        joints: The joints of the linkage, in the order of the rows of `xy`.
+        xy: The (N, 2) array of joint locations of the linkage's `JointArray`.
+    """
+    def __init__(self, joint_array, drivers, steps, pair_i, pair_j, pair_length, margin):
+        """Use `FramePlan.for_solvers` instead."""
+        self.joint_array = joint_array
+        self.joints = joint_array.joints
+        self.index = dict((j, i) for i, j in enumerate(self.joints))
+        self.xy = joint_array.xy
+        self.driver_kind = np.array([d[0] for d in drivers], dtype=np.int8)
+        self.driver_joint = np.array([self.index[d[1]] for d in drivers], dtype=np.int32)
+        self.driver_params = np.array([d[2] for d in drivers], dtype=np.float64).reshape(len(drivers), 6)
+        self.steps = np.zeros(len(steps), dtype=STEP_DTYPE)
+        for row, (kind, target, a, b, params, chooser) in zip(self.steps, steps):
+            row['a_param'], row['b_param'] = params
+            row['target'] = self.index[target]
+            row['a'] = self.index[a]
+            row['b'] = self.index[b]
+            row['kind'] = kind
+            row['chooser'] = chooser
+        #The rows `solve_frame` writes, whose joints' locations need updating afterwards.
+        self.written_rows = self.driver_joint.tolist() + self.steps['target'].tolist()
+        self.pair_i = pair_i
+        self.pair_j = pair_j
+        self.pair_length = pair_length
+        self.margin = margin
+
+    @classmethod
+    def for_solvers(cls, joint_array, drivers, solvers, pair_i, pair_j, pair_length, margin):
+        """Build a plan from the solver functions made by `Linkage.generate_simulation_function`.
+
+        `pair_i` and `pair_j` are int32 arrays of the rows of `joint_array` at either end of each bar segment,
+        and `pair_length` is a float64 array of the length each segment must stay within `margin` of.
+
+        Returns None if the linkage uses anything `solve_frame` can't handle, such as custom drivers or chooser functions.
+        """
+        driver_rows = []
+        for driver in drivers:
+            params = _driver_params(driver)
+            if params is None:
+                return None
+            driver_rows.append((params[0], driver.attachment_joint, params[1]))
+        steps = []
+        for solver in solvers:
+            if solver.solver_type == "intersection":
+                target, a, a_radius, b, b_radius = solver.solver_args
+                if target.chooser == None:
+                    chooser = NO_CHOOSER
+                elif isinstance(target.chooser, int):
+                    chooser = target.chooser
+                else:
+                    #A chooser function can't be compiled.
+                    return None
+                steps.append((INTERSECTION, target, a, b, (a_radius, b_radius), chooser))
+            else:
+                target, a, b, length = solver.solver_args
+                steps.append((EXTENSION, target, a, b, (length, 0.0), NO_CHOOSER))
+        return cls(joint_array, driver_rows, steps, pair_i, pair_j, pair_length, margin)
+
+    def solve(self, time):
+        """Simulate the linkage at `time` and update the locations of its joints.
+
+        Returns True on success. On failure, returns False, and the joints may be partially updated.
+        """
+        result, index = solve_frame(time,
+                                    self.driver_kind, self.driver_joint, self.driver_params,
+                                    self.steps,
+                                    self.pair_i, self.pair_j, self.pair_length, self.margin,
+                                    self.xy)
+        self.joint_array.changed(self.written_rows)
+        return result == SOLVED
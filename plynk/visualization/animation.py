@@ -108,59 +108,89 @@ def linkage_animation(linkage,
             item.set_data([], [])
         return graph_items
     
-    #Initialize the data
-    data = {}
-    #For every frame index, create and store the data for everything in graph_items:
-    for i in range(frames):
-        #Find the simulator time:
-        time = math.fmod(i/(float(frames) / repetitions), 1.0)
-        #Modify
-        if modifier != None:
-            modifier(linkage, i, time)
-            linkage.invalidate_caches()
-        #Simulate the linkage:
-        linkage.simulate_to_time(time)
-        #Initialize the data for this frame:
-        frame_data = dict({})
-        for e in bars:
-            frame_data[e[1]] = zip(*[j.location for j in e[0].joints])
-        for e in drivers:
-            frame_data[e[1]] = zip(*[e[0].location, e[0].attachment_joint.location])
-        for e in joint_trackers:
-            new_point = e[0].location
-            points = zip(*(data[i-1][e[1]])) if i != 0 else []
-            points.append(new_point)
-            frame_data[e[1]] = zip(*points)
-        for e in func_trackers:
-            new_point = e[0](linkage, time)
-            points = zip(*(data[i-1][e[1]])) if i != 0 else []
-            if new_point == None:
-                new_point = (np.nan, np.nan)
-            if(i < (frames / repetitions)):
-                points.append(new_point)
-            frame_data[e[1]] = zip(*points)
-        for e in time_functions:
-            points = zip(*(data[i-1][e[1]])) if i != 0 else []
-            new_point = (time, e[0](linkage, time))
-            if(new_point[1] == None):
-                new_point = (new_point[0], np.nan)
-            if(i < (frames / repetitions)):
-                points.append(new_point)
-                points.sort(key = lambda p: p[0])
-            frame_data[e[1]] = zip(*points)
-            frame_data[e[2]] = ([time, time], [0, 1])
-        frame_data[joints] = zip(*[j.location for j in linkage.joints])
-        data[i] = frame_data
+    #The simulator time of every frame:
+    times = np.fmod(np.arange(frames) / (float(frames) / repetitions), 1.0).tolist()
+    #Function trackers are only recorded for the first repetition, and keep that history afterwards:
+    recorded = min(frames, int(math.ceil(frames / repetitions)))
+    #Without a modifier, every whole repetition is the same as the first, so only that one needs simulating.
+    #A modifier may change the linkage from frame to frame, so then every frame is simulated.
+    if modifier == None and isinstance(repetitions, (int, long)):
+        simulated = recorded
+    else:
+        simulated = frames
+    #A modifier may also change the drivers, so only precompute them when there isn't one:
+    if modifier == None:
+        linkage.precompute(times[:simulated])
+    #The joint locations for every frame; the bars, drivers and joint trackers are all drawn from these.
+    joint_rows = dict((j, row) for row, j in enumerate(linkage.joints))
+    joint_xy = np.empty((frames, len(linkage.joints), 2))
+    driver_xy = np.empty((frames, len(drivers), 2))
+    func_xy = [np.full((recorded, 2), np.nan) for e in func_trackers]
+    #Times only increase over the first repetition, so timed functions are recorded already sorted by time:
+    timed_xy = [np.full((recorded, 2), np.nan) for e in time_functions]
+    #For every simulated frame index, simulate the linkage and record the data for everything in graph_items:
+    #The precomputed driver positions are discarded even if the linkage turns out to be invalid.
+    try:
+        for i in range(simulated):
+            #Find the simulator time:
+            time = times[i]
+            #Modify
+            if modifier != None:
+                modifier(linkage, i, time)
+                linkage.invalidate_caches()
+            #Simulate the linkage:
+            linkage.simulate_to_time(time)
+            joint_xy[i] = linkage.joint_array.xy
+            for d, e in enumerate(drivers):
+                driver_xy[i, d] = e[0].location
+            if i < recorded:
+                for e, xy in zip(func_trackers, func_xy):
+                    new_point = e[0](linkage, time)
+                    if new_point != None:
+                        xy[i] = new_point
+                for e, xy in zip(time_functions, timed_xy):
+                    value = e[0](linkage, time)
+                    xy[i] = (time, np.nan if value == None else value)
+    finally:
+        linkage.precompute(None)
+    #Repeat the simulated frames over the rest:
+    repeated = np.arange(simulated, frames) % simulated
+    joint_xy[simulated:] = joint_xy[repeated]
+    driver_xy[simulated:] = driver_xy[repeated]
+    
+    #Gather each bar's joints, and each driver's location and joint, into one (frames, points, 2) array each:
+    bar_xy = [joint_xy[:, [joint_rows[j] for j in e[0].joints]] for e in bars]
+    driver_xy = [np.stack((driver_xy[:, d], joint_xy[:, joint_rows[e[0].attachment_joint]]), axis=1) for d, e in enumerate(drivers)]
+    tracker_rows = [joint_rows[e[0]] for e in joint_trackers]
     
     #The animate function just sets the precomputed data for that frame.
     def animate(i):
-        for graph_item in graph_items:
-            graph_item.set_data(*data[i][graph_item])
+        for e, xy in zip(bars, bar_xy):
+            e[1].set_data(xy[i, :, 0], xy[i, :, 1])
+        for e, xy in zip(drivers, driver_xy):
+            e[1].set_data(xy[i, :, 0], xy[i, :, 1])
+        #A joint's track is every location it has had up to this frame.
+        #Tracks are views of columns, so set them directly rather than through set_data's unpacking.
+        for e, row in zip(joint_trackers, tracker_rows):
+            e[1].set_xdata(joint_xy[:i + 1, row, 0])
+            e[1].set_ydata(joint_xy[:i + 1, row, 1])
+        n = min(i + 1, recorded)
+        for e, xy in zip(func_trackers, func_xy):
+            e[1].set_xdata(xy[:n, 0])
+            e[1].set_ydata(xy[:n, 1])
+        for e, xy in zip(time_functions, timed_xy):
+            e[1].set_xdata(xy[:n, 0])
+            e[1].set_ydata(xy[:n, 1])
+            e[2].set_data([times[i], times[i]], [0, 1])
+        joints.set_data(joint_xy[i, :, 0], joint_xy[i, :, 1])
         return graph_items
     
-    #Autscale all animated things.
-    util.autoscale_animation([ax], init, animate, frames = frames, inset = inset)
-    util.autoscale_animation([e[3] for e in time_functions], init, animate, axis='y', frames = frames)
+    #Autscale all animated things. One pass over the frames does the linkage and the timed functions together;
+    #the timed functions aren't inset.
+    #When only the first repetition was simulated, every later frame shows data already seen in it, so only it needs scaling to.
+    scaled_frames = recorded if simulated == recorded else frames
+    util.autoscale_animation([ax] + [e[3] for e in time_functions], init, animate, frames = scaled_frames,
+                             inset = [inset] + [0] * len(time_functions))
     
     #If a legend is wanted, make one:
     if(legend and (len(joint_trackers) > 0 or len(track_functions) > 0)):
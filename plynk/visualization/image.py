@@ -1,5 +1,7 @@
 from matplotlib import pyplot as plt
 
+import numpy as np
+
 from plynk.visualization import util
 
 plt.style.use('ggplot')
@@ -51,20 +53,24 @@ def linkage_image(linkage,
     for e in drivers:
         e[1].set_data(*(zip(*[e[0].location, e[0].attachment_joint.location])))
         
-    for i in range(frames):
-        linkage.simulate_to_time(i / float(frames))
-        for e in joint_trackers:
-            new_point = e[0].location
-            points = zip(*e[1].get_data())
-            points.append(new_point)
-            e[1].set_data(*(zip(*points)))
-        for e in func_trackers:
-            new_point = e[0](linkage, i / float(frames))
-            points = zip(*e[1].get_data())
-            if new_point == None:
-                new_point = (np.nan, np.nan)
-            points.append(new_point)
-            e[1].set_data(*(zip(*points)))
+    #Record every tracked point over the frames, then draw each track once.
+    joint_tracks = [np.full((frames, 2), np.nan) for e in joint_trackers]
+    func_tracks = [np.full((frames, 2), np.nan) for e in func_trackers]
+    linkage.precompute([i / float(frames) for i in range(frames)])
+    #The precomputed driver positions are discarded even if the linkage turns out to be invalid.
+    try:
+        for i in range(frames):
+            linkage.simulate_to_time(i / float(frames))
+            for e, track in zip(joint_trackers, joint_tracks):
+                track[i] = e[0].location
+            for e, track in zip(func_trackers, func_tracks):
+                new_point = e[0](linkage, i / float(frames))
+                if new_point != None:
+                    track[i] = new_point
+    finally:
+        linkage.precompute(None)
+    for e, track in zip(joint_trackers + func_trackers, joint_tracks + func_tracks):
+        e[1].set_data(track[:, 0], track[:, 1])
         
     ax.relim()
     ax.autoscale()
@@ -1,4 +1,8 @@
-import plynk.geometry
+import math
+from operator import itemgetter
+
+#Bound once; JointSpeedTracker takes a square root every frame.
+_sqrt = math.sqrt
 
 class TimedJointsTracker(object):
     """Track any property of one or more joint over time.
@@ -14,12 +18,20 @@ class TimedJointsTracker(object):
         self.joints = joints
         self.attribute = attribute
         self.chooser = chooser
+        #The number of joints doesn't change, so pick the implementation once instead of every frame.
+        #(Special methods are looked up on the class, so `__call__` itself can't be replaced per instance.)
+        self._call = self._call_multi if len(joints) > 1 else self._call_single
         
     def __call__(self, linkage, time):
-        if(len(self.joints) > 1):
-            return self.attribute(self.chooser({joint : self.attribute(joint) for joint in self.joints}))
-        else:
-            return self.attribute(self.joints[0])
+        return self._call()
+    
+    def _call_single(self):
+        return self.attribute(self.joints[0])
+    
+    def _call_multi(self):
+        #The chosen joint's value is already known, so look it up rather than computing it again.
+        values = {joint : self.attribute(joint) for joint in self.joints}
+        return values[self.chooser(values)]
         
     @staticmethod
     def x_coordinate(joint):
@@ -33,11 +45,13 @@ class TimedJointsTracker(object):
     
     @staticmethod
     def least_attribute(joints):
-        return min(joints, key=lambda j: joints[j])
+        """Chooser: the joint with the least attribute value"""
+        return min(joints.iteritems(), key=itemgetter(1))[0]
     
     @staticmethod
     def greatest_attribute(joints):
-        return max(joints, key=lambda j: joints[j])
+        """Chooser: the joint with the greatest attribute value"""
+        return max(joints.iteritems(), key=itemgetter(1))[0]
     
 class JointSpeedTracker(object):
     """Track the speed of a joint.
@@ -46,10 +60,12 @@ class JointSpeedTracker(object):
         joint: The joint to track.
         dimension: The dimension in which to track speed. This can be 'x', to track X-speed, 'y' to track Y-speed, or 'xy' to track
                    speed in the Cartesian plane.
+        squared: Whether to track the square of the speed instead, which saves a square root in the 'xy' dimension.
     """
-    def __init__(self, joint, dimension='xy'):
+    def __init__(self, joint, dimension='xy', squared=False):
         self.joint = joint
         self.dimension = dimension
+        self.squared = squared
         self.old_location = None
         self.old_time = None
         if not dimension in ['x', 'y', 'xy']:
@@ -57,16 +73,25 @@ class JointSpeedTracker(object):
         
     def __call__(self, linkage, time):
         res = None
-        if not (self.old_location == None or self.old_time == None):
+        location = self.joint.location
+        if self.old_location is not None and self.old_time is not None:
             delta_t = time - self.old_time
             delta_l = None
             if self.dimension == 'x':
-                delta_l = self.joint.location[0] - self.old_location[0]
+                delta_l = location[0] - self.old_location[0]
             elif self.dimension == 'y':
-                delta_l = self.joint.location[1] - self.old_location[1]
+                delta_l = location[1] - self.old_location[1]
             elif self.dimension == 'xy':
-                delta_l = plynk.geometry.distance(self.joint.location, self.old_location)
-            res = float(delta_l) / delta_t
-        self.old_location = self.joint.location
+                dx = location[0] - self.old_location[0]
+                dy = location[1] - self.old_location[1]
+                if self.squared:
+                    res = (dx*dx + dy*dy) / (delta_t * delta_t)
+                else:
+                    delta_l = _sqrt(dx*dx + dy*dy)
+            if delta_l is not None:
+                res = delta_l / delta_t
+                if self.squared:
+                    res = res * res
+        self.old_location = location
         self.old_time = time
         return res
\ No newline at end of file
@@ -1,19 +1,50 @@
+import numpy as np
+
+def _locations(joints):
+    """Returns the locations of `joints` as an (N, 2) array, gathered straight from their `JointArray` when they share one.
+    
+    Raises ValueError if any of the joints is unsolved, since it can't be picked by location.
+    """
+    rows = [j.array_row() for j in joints]
+    joint_array = rows[0][0]
+    if all(r[0] is joint_array for r in rows):
+        xy = joint_array.xy[[r[1] for r in rows]]
+    else:
+        xy = np.array([(np.nan, np.nan) if j.location is None else j.location for j in joints], dtype=float)
+    #argmin and argmax would return the first NaN, silently picking an unsolved joint.
+    unsolved = np.isnan(xy[:, 0])
+    if unsolved.any():
+        raise ValueError("Joint %s has no location to be picked by." % joints[int(unsolved.argmax())].label)
+    return xy
+
 class JointPickerTracker(object):
     """Tracks whichever joint of a set of joints is chosen by a function.
     
     Attributes:
         joints: The joints to choose between.
         picker: A function that takes the list of joints, and returns the chosen one.
+        
+    The joints matching `joints` are looked up once per linkage the tracker is called with.
+    Call `invalidate` if the linkage's joints or their labels change.
     """
     
     def __init__(self, joints, picker):
         self.joints_selector = joints
         self.picker = picker
         self.current_joint = None
+        self.invalidate()
+        
+    def invalidate(self):
+        """Forget the joints looked up for the last linkage, so they are looked up again on the next call."""
+        self._resolved_linkage = None
+        self._resolved = None
         
     def __call__(self, linkage, time):
-        joint = self.picker(linkage.js(self.joints_selector), time)
-        if not joint == self.current_joint:
+        if linkage is not self._resolved_linkage:
+            self._resolved = linkage.js(self.joints_selector)
+            self._resolved_linkage = linkage
+        joint = self.picker(self._resolved, time)
+        if joint is not self.current_joint:
             #Insert discontinuity
             self.current_joint = joint
             return None
@@ -22,19 +53,16 @@ class JointPickerTracker(object):
     
     @staticmethod
     def least_y(joints, time):
-        return min(joints, key = lambda j: j.location[1])
+        return joints[int(np.argmin(_locations(joints)[:, 1]))]
     
     @staticmethod
     def least_x(joints, time):
-        return min(joints, key = lambda j: j.location[0])
+        return joints[int(np.argmin(_locations(joints)[:, 0]))]
     
     @staticmethod
     def greatest_y(joints, time):
-        return max(joints, key = lambda j: j.location[1])
+        return joints[int(np.argmax(_locations(joints)[:, 1]))]
     
     @staticmethod
     def greatest_x(joints, time):
-        return max(joints, key = lambda j: j.location[0])
-    
-    
-    
+        return joints[int(np.argmax(_locations(joints)[:, 0]))]
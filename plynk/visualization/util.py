@@ -1,6 +1,44 @@
 from functools import wraps
+from itertools import chain
+
+import numpy as np
+
+from plynk import jit
+
+@jit.njit(cache=True)
+def _compiled_bounds(xdat, ydat):
+    #One pass over each array. Comparisons with NaN are false, so NaN is skipped.
+    xmin = np.inf
+    xmax = -np.inf
+    for x in xdat:
+        if x < xmin:
+            xmin = x
+        if x > xmax:
+            xmax = x
+    ymin = np.inf
+    ymax = -np.inf
+    for y in ydat:
+        if y < ymin:
+            ymin = y
+        if y > ymax:
+            ymax = y
+    return (xmin, xmax, ymin, ymax)
+
+def _numpy_range(dat):
+    #fmin and fmax skip NaN, which marks gaps in the data. They can't reduce an empty array, so
+    #give empty arrays the same infinite range as the compiled loop.
+    if dat.size == 0:
+        return (np.inf, -np.inf)
+    return (np.fmin.reduce(dat), np.fmax.reduce(dat))
+
+def _numpy_bounds(xdat, ydat):
+    return _numpy_range(xdat) + _numpy_range(ydat)
+
+#Returns the x min, x max, y min and y max of arrays of x and y data, ignoring NaN.
+#Looping in Python would be far slower than numpy, so only loop when it's compiled.
+_reduce_bounds = _compiled_bounds if jit.ENABLED else _numpy_bounds
  
-def autoscale_animation(axes, animation_init, animation_func, frames = 200, axis = 'both', inset = 0):
+def autoscale_animation(axes, animation_init, animation_func, frames = 200, axis = 'both', inset = 0, settle_frames = None):
     """Rescale a set of axes to fit the range of an animation on those axes.
     
     Important Note: Animations that are sent to this function have both of their
@@ -11,34 +49,80 @@ def autoscale_animation(axes, animation_init, animation_func, frames = 200, axis
         axes: A list of matplotlib axes that are being animated by the given
               animating functions.
         animation_init: A matplotlib FuncAnimation initialization function.
-                        This function is called TWO times: once to initialize the
-                        animation, and again to reset it after the work is done.
+                        This function is called once, to initialize the animation.
+                        The animation isn't reset afterwards; FuncAnimation calls it
+                        again itself when it starts.
         animation_func: A matplotlib FuncAnimation animation function. This is called
                         `frames` times.
         axis: The axis dimensions to autoscale. Can be 'both' (default), 'x', or 'y'.
         frames: The nubmber of frames to simulate.
+        inset: The inset of the animation from the edges of the axes, as a fraction of its range.
+               Either one value for all of the axes, or a list with a value for each.
+        settle_frames: If given, stop simulating frames early once this many frames in a row
+                       haven't widened the range of any of the axes. Periodic animations, like
+                       those of linkages driven by cranks, usually cover their whole range well
+                       before `frames`. By default, all `frames` are simulated.
         
     Returns nothing.
     """
     animation_init()
-    limlist = [([], []) for ax in axes]
+    #For each axes, the running x min, x max, y min and y max over the frames so far.
+    bounds = [[np.inf, -np.inf, np.inf, -np.inf] for ax in axes]
+    #The axes never change, so map them to their indices once.
+    ax_index = dict((id(ax), idex) for idex, ax in enumerate(axes))
+    n_axes = len(axes)
+    #Animations usually return the same artists every frame, so look up each artist's axes index
+    #and data getters once. Keeping the artist alive also keeps its id from being reused.
+    artist_cache = {}
+    #The number of frames in a row that haven't changed any bounds.
+    unchanged = 0
     for i in range(frames):
         graph_items = animation_func(i)
-        for idex, ax in enumerate(axes):
-            xdat = []
-            ydat = []
-            for graph_item in [g for g in graph_items if g.get_axes() == ax]:
-                xdat.extend(graph_item.get_xdata())
-                ydat.extend(graph_item.get_ydata())
-            limlist[idex][0].append((min(xdat), max(xdat)))
-            limlist[idex][1].append((min(ydat), max(ydat)))
+        #Sort the items by axes in one pass, asking each item for its axes once.
+        buckets = [[] for idex in range(n_axes)]
+        for g in graph_items:
+            cached = artist_cache.get(id(g))
+            if cached is None:
+                cached = (g, ax_index.get(id(g.get_axes())), g.get_xdata, g.get_ydata)
+                artist_cache[id(g)] = cached
+            idex = cached[1]
+            if idex is not None:
+                buckets[idex].append(cached)
+        changed = False
+        for idex, items in enumerate(buckets):
+            #Nothing drawn on these axes this frame, so nothing to widen the bounds with.
+            if not items:
+                continue
+            #get_xdata returns the array the artist was given without copying, and asarray doesn't copy float arrays.
+            xdat = np.concatenate([np.asarray(c[2](), dtype=float) for c in items])
+            ydat = np.concatenate([np.asarray(c[3](), dtype=float) for c in items])
+            xmin, xmax, ymin, ymax = _reduce_bounds(xdat, ydat)
+            #Comparisons with NaN are false, so frames with no data at all leave the bounds alone.
+            b = bounds[idex]
+            if xmin < b[0]:
+                b[0] = xmin
+                changed = True
+            if xmax > b[1]:
+                b[1] = xmax
+                changed = True
+            if ymin < b[2]:
+                b[2] = ymin
+                changed = True
+            if ymax > b[3]:
+                b[3] = ymax
+                changed = True
+        unchanged = 0 if changed else unchanged + 1
+        if settle_frames is not None and unchanged >= settle_frames:
+            break
+    if not isinstance(inset, (list, tuple)):
+        inset = [inset] * n_axes
     for idex, ax in enumerate(axes):
-        xlim = (min([xlim[0] for xlim in limlist[idex][0]]), max([xlim[1] for xlim in limlist[idex][0]]))
-        ylim = (min([ylim[0] for ylim in limlist[idex][1]]), max([ylim[1] for ylim in limlist[idex][1]]))
+        xlim = (bounds[idex][0], bounds[idex][1])
+        ylim = (bounds[idex][2], bounds[idex][3])
         xlen = xlim[1] - xlim[0]
         ylen = ylim[1] - ylim[0]
-        xlim = (xlim[0] - xlen*inset, xlim[1] + xlen*inset)
-        ylim = (ylim[0] - ylen*inset, ylim[1] + ylen*inset)
+        xlim = (xlim[0] - xlen*inset[idex], xlim[1] + xlen*inset[idex])
+        ylim = (ylim[0] - ylen*inset[idex], ylim[1] + ylen*inset[idex])
         ax.set_xlim(xlim)
         ax.set_ylim(ylim)
         
@@ -75,10 +159,7 @@ def compose_animations(animations):
         return graph_items
     
     def animate(i):
-        graph_items = []
-        for afunc in animates:
-            graph_items.extend(afunc(i))
-        return graph_items
+        return list(chain.from_iterable(afunc(i) for afunc in animates))
     
     return (init, animate)
 